@@ -1,11 +1,17 @@
-from bokeh.plotting import figure, save, show
-from bokeh.models import LabelSet, ColumnDataSource, CustomJSTickFormatter
-from bokeh.core.properties import value
-from bokeh.io import output_notebook as on
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+# bokeh is slow to import, so it is only imported once something is actually rendered
+if TYPE_CHECKING:
+    from bokeh.plotting import figure
+    from bokeh.models import ColumnDataSource
 
 
 def output_notebook():
     """A warper for the bokeh output_notebook function"""
+    from bokeh.io import output_notebook as on
+
     on()
 
 
@@ -18,6 +24,8 @@ def get_source_from_event_dict(event_dict: dict) -> ColumnDataSource:
     Returns:
         ColumnDataSource: The converted data
     """
+    from bokeh.models import ColumnDataSource
+
     return ColumnDataSource(data=event_dict)
 
 
@@ -30,6 +38,8 @@ def setup_figure(*args, **kwargs) -> figure:
     Returns:
         figure: A plot on which to create a timeline
     """
+    from bokeh.plotting import figure
+
     if "tools" not in kwargs:
         kwargs["tools"] = "hover,pan,wheel_zoom,box_zoom,reset,save"
     return figure(*args, **kwargs)
@@ -45,15 +55,9 @@ def get_y_range(event_dict: dict, period_list: list) -> list[str]:
     Returns:
         list[str]: A list of labels to populate the dictionary
     """
-    y_range = []
-    for i in range(len(period_list)):
-        y_range.append("p" + str(i))
-
-    for label in event_dict['label']:
-        if label not in y_range:
-            y_range.append(label)
-
-    return y_range
+    y_range = dict.fromkeys([f"p{i}" for i in range(len(period_list))])
+    y_range.update(dict.fromkeys(event_dict['label']))
+    return list(y_range)
 
 
 def render_events(plot: figure, source: ColumnDataSource, x: str, y: str, size: int) -> None:
@@ -106,6 +110,8 @@ def event_labels(
         text_color (str, optional): The color of the labels. Defaults to "#555555".
         text_align (str, optional): The text alignment of the labels. Defaults to 'center'.
     """
+    from bokeh.models import LabelSet
+
     labels = LabelSet(
         x=x,
         y=y,
@@ -127,6 +133,8 @@ def render_periods(plot: figure, period_list: list, height: float = 0.3, color:
         period_list (list): The list of periods to be rendered
         height (float, optional): The height of the rendered periods. Defaults to 0.3.
     """
+    from bokeh.core.properties import value
+
     for i in range(len(period_list)):
         period_group = period_list[i]
         source = get_source_from_event_dict(period_group)
@@ -153,6 +161,9 @@ def period_labels(
         text_color (str, optional): The text color of the labels. Defaults to "#555555".
         text_align (str, optional): The text alignment of the labels. Defaults to 'center'.
     """
+    from bokeh.models import LabelSet
+    from bokeh.core.properties import value
+
     for i in range(len(period_list)):
         period_group = period_list[i]
         source = get_source_from_event_dict(period_group)
@@ -180,6 +191,8 @@ def format_xaxis(plot: figure, scientific: bool = False) -> figure:
     Returns:
         figure: The modified plot
     """
+    from bokeh.models import CustomJSTickFormatter
+
     code = ""
     if scientific:
         code = '''return tick < 0 ? Math.abs(tick) + " BCE" : tick +  " CE"'''
@@ -204,6 +217,8 @@ def render_timeline(
     Returns:
         figure: The modified plot
     """
+    from bokeh.plotting import save, show
+
     source = get_source_from_event_dict(event_dict)
     y_range = get_y_range(event_dict, period_list)
     p = setup_figure(title=title, x_axis_label="year", y_axis_label="category", height=400, width=1600, y_range=y_range)
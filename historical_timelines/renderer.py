@@ -1,14 +1,24 @@
-from bokeh.plotting import figure, save, show
-from bokeh.models import LabelSet, ColumnDataSource, CustomJSTickFormatter
-from bokeh.models import BoxZoomTool, PanTool, ResetTool
-from bokeh.core.properties import value
-from bokeh.io import output_notebook as on
+from __future__ import annotations
 
-# from .graphics import * 
+from itertools import chain
+from typing import TYPE_CHECKING
 
+import numpy as np
+
+# bokeh is slow to import, so it is only imported once something is actually rendered
+if TYPE_CHECKING:
+    from bokeh.plotting import figure
+    from bokeh.models import ColumnDataSource
+
+from .event import HistoricalEvent
 from .timeline import HistoricalTimeline
 
 class HistoricalTimelineRenderer:
+    # Formatter models cannot be shared between figures saved to different documents, so only the code is shared
+    _xaxis_formatter_code = {
+        True: '''return tick < 0 ? Math.abs(tick) + " BCE" : tick +  " CE"''',
+        False: '''return tick < 0 ? Math.abs(tick) + " BC" : tick +  " AD"''',
+    }
 
     def __init__(self, tl: HistoricalTimeline, bg_color:str = "white", bg_alpha:float = 1, period_color: str = "red", event_color: str = "blue") -> None:
         """Initialization function"""
@@ -17,18 +27,109 @@ class HistoricalTimelineRenderer:
         self.bg_alpha = bg_alpha
         self.period_color = period_color
         self.event_color = event_color
-        self.tools = [BoxZoomTool(), ResetTool(),PanTool(dimensions="width")]
+        self._figure = None
+        self._figure_key = None
+        self._source_cache = {}
+        self._event_dict = None
+        self._period_dict = None
+        self._event_source = None
+        self._period_source = None
+        self._y_range = None
+
+    def get_tools(self) -> list:
+        """Create the tools of a timeline plot
+
+        New tool instances are made for every figure, as bokeh models can only belong to one document
+        and a rebuilt figure has to be saved or shown separately from the one it replaces.
+
+        Returns:
+            list: The box zoom, reset and horizontal pan tools
+        """
+        from bokeh.models import BoxZoomTool, PanTool, ResetTool
+
+        return [BoxZoomTool(), ResetTool(), PanTool(dimensions="width")]
+
+    def get_source_data(self, event_dict: dict) -> dict:
+        """Prepare a dictionary to be used as the data of a ColumnDataSource
+
+        List columns of numbers are converted to numpy arrays, which bokeh can send to the browser
+        as binary buffers instead of converting every element. Text, nested and other columns are
+        left as they are; only the first element is looked at to tell them apart.
+
+        Args:
+            event_dict (dict): The dictionary input
+
+        Returns:
+            dict: The data for the ColumnDataSource
+        """
+        data = {}
+        for name, column in event_dict.items():
+            if isinstance(column, list) and column and isinstance(column[0], (int, float)):
+                array = np.asarray(column)
+                # A column that only starts with a number may still hold something else
+                data[name] = array if array.dtype.kind in "biuf" else column
+            else:
+                data[name] = column
+        return data
 
     def get_source_from_event_dict(self, event_dict: dict) -> ColumnDataSource:
         """Convert a dictionary into a ColumnDataSource
 
+        Converting the same dictionary object again returns the same ColumnDataSource,
+        so the dictionary should not be modified once it has been converted.
+
         Args:
             event_dict (dict): The dictionary input
 
         Returns:
             ColumnDataSource: The converted data
         """
-        return ColumnDataSource(data=event_dict)
+        from bokeh.models import ColumnDataSource
+
+        cached = self._source_cache.get(id(event_dict))
+        if cached is not None and cached[0] is event_dict:
+            return cached[1]
+        source = ColumnDataSource(data=self.get_source_data(event_dict))
+        self._source_cache[id(event_dict)] = (event_dict, source)
+        return source
+
+    def get_period_names(self, period_list: list) -> list[str]:
+        """Get the y range categories the period groups are drawn on
+
+        Args:
+            period_list (list): The period list
+
+        Returns:
+            list[str]: The name of each period group
+        """
+        return [f"p{i}" for i in range(len(period_list))]
+
+    def get_period_dict(self, period_list: list, period_names: list[str] = None) -> dict:
+        """Combine every period group into a single dictionary
+
+        Each row is tagged in the column "y" with the name of the period group it belongs to,
+        so that all periods can be drawn with one glyph.
+
+        Args:
+            period_list (list): The period list
+            period_names (list[str], optional): The name of each period group. Defaults to get_period_names.
+
+        Returns:
+            dict: The combined period data
+        """
+        if period_names is None:
+            period_names = self.get_period_names(period_list)
+        if not period_list:
+            return {"start": [], "end": [], "mid": [], "title": [], "description": [], "y": []}
+        # Numeric columns are joined in one numpy call, text columns stay lists for bokeh
+        return {
+            "start": np.concatenate([period_group["start"] for period_group in period_list]),
+            "end": np.concatenate([period_group["end"] for period_group in period_list]),
+            "mid": np.concatenate([period_group["mid"] for period_group in period_list]),
+            "title": list(chain.from_iterable(period_group["title"] for period_group in period_list)),
+            "description": list(chain.from_iterable(period_group["description"] for period_group in period_list)),
+            "y": [name for name, period_group in zip(period_names, period_list) for _ in period_group["start"]],
+        }
 
     def setup_figure(self, *args, **kwargs) -> figure:
         """Create plot with which to create the timeline on.
@@ -36,32 +137,50 @@ class HistoricalTimelineRenderer:
         This function is essentially a wrapper for the bokeh function figure.
         See its documentation for more information.
 
+        The plot uses the WebGL output backend unless output_backend is given. The event scatter
+        and period bars are both glyphs WebGL can draw; browsers without WebGL fall back to canvas.
+        Bokeh 3.3 and later request the WebGL context without browser antialiasing, as Bokeh
+        antialiases its WebGL glyphs itself.
+
+        The level of detail options lod_threshold, lod_factor, lod_interval and lod_timeout are set
+        explicitly to bokeh's current defaults (2000, 10, 300 and 500), so that they are visible here
+        and can be overridden.
+
         Returns:
             figure: A plot on which to create a timeline
         """
+        from bokeh.plotting import figure
+
+        kwargs.setdefault("output_backend", "webgl")
+        kwargs.setdefault("lod_threshold", 2000)
+        kwargs.setdefault("lod_factor", 10)
+        kwargs.setdefault("lod_interval", 300)
+        kwargs.setdefault("lod_timeout", 500)
         fig = figure(*args, **kwargs)
         fig.toolbar.logo = None
         return fig
 
-    def get_y_range(self, event_dict: dict, period_list: list) -> list[str]:
+    def get_y_range(self, event_dict: dict, period_list: list, period_names: list[str] = None) -> list[str]:
         """Get the labels that populate the y range
 
         Args:
             event_dict (dict): The event dictionary
             period_list (list): The period list
+            period_names (list[str], optional): The name of each period group. Defaults to get_period_names.
 
         Returns:
             list[str]: A list of labels to populate the dictionary
         """
-        y_range = []
-        for i in range(len(period_list)):
-            y_range.append("p" + str(i))
-
-        for label in event_dict['label']:
-            if label not in y_range:
-                y_range.append(label)
-
-        return y_range
+        if period_names is None:
+            period_names = self.get_period_names(period_list)
+        labels = event_dict['label']
+        if isinstance(labels, np.ndarray):
+            # Deduplicate in numpy, keeping the labels in order of first appearance
+            _, first = np.unique(labels, return_index=True)
+            labels = labels[np.sort(first)].tolist()
+        y_range = dict.fromkeys(period_names)
+        y_range.update(dict.fromkeys(labels))
+        return list(y_range)
 
     def render_events(self, plot: figure, source: ColumnDataSource, x: str, y: str, size: int) -> None:
         """Render events on the plot
@@ -73,6 +192,8 @@ class HistoricalTimelineRenderer:
             y (str): The name of the column of source that lists the event y axis
             size (int): The size of the events
         """
+        if len(source.data[x]) == 0:
+            return
         plot.scatter(x=x, y=y, size=size, source=source, color=self.event_color)
 
     def event_tooltips(self, plot: figure, tooltip_names: list[str]) -> None:
@@ -82,10 +203,7 @@ class HistoricalTimelineRenderer:
             plot (figure): The plot to be modified
             tooltip_names (list[str]): The categories to be shown in the tooltip
         """
-        tooltips = []
-        for tool in tooltip_names:
-            tooltips.append((tool, "@" + tool))
-        plot.hover.tooltips = tooltips
+        plot.hover.tooltips = [(tool, f"@{tool}") for tool in tooltip_names]
 
 
     def event_labels(
@@ -113,6 +231,10 @@ class HistoricalTimelineRenderer:
             text_color (str, optional): The color of the labels. Defaults to "#555555".
             text_align (str, optional): The text alignment of the labels. Defaults to 'center'.
         """
+        from bokeh.models import LabelSet
+
+        if len(source.data[x]) == 0:
+            return
         labels = LabelSet(
             x=x,
             y=y,
@@ -126,25 +248,26 @@ class HistoricalTimelineRenderer:
         plot.add_layout(labels)
 
 
-    def render_periods(self, plot: figure, period_list: list, height: float = 0.3) -> None:
+    def render_periods(self, plot: figure, source: ColumnDataSource, y: str = "y", height: float = 0.3) -> None:
         """Render the periods on the plot
 
         Args:
             plot (figure): The plot to be rendered on
-            period_list (list): The list of periods to be rendered
+            source (ColumnDataSource): The data of all period groups to be rendered
+            y (str, optional): The name of the column of source that lists the period group. Defaults to "y".
             height (float, optional): The height of the rendered periods. Defaults to 0.3.
         """
-        for i in range(len(period_list)):
-            period_group = period_list[i]
-            source = self.get_source_from_event_dict(period_group)
-            plot.hbar(right='start', left='end', y=value("p" + str(i)), height=height, color=self.period_color, source=source)
+        if len(source.data['start']) == 0:
+            return
+        plot.hbar(right='start', left='end', y=y, height=height, color=self.period_color, source=source)
 
 
     def period_labels(
         self, 
         plot: figure,
-        period_list: list,
+        source: ColumnDataSource,
         text: str,
+        y: str = "y",
         y_offset: int = -8,
         text_font_size: str = "11px",
         text_color: str = "#555555",
@@ -154,27 +277,29 @@ class HistoricalTimelineRenderer:
 
         Args:
             plot (figure): The plot events are rendered on
-            period_list (list): The list of periods to be given labels
+            source (ColumnDataSource): The data of all period groups to be given labels
             text (str): The name of the column of source that lists the period label text
+            y (str, optional): The name of the column of source that lists the period group. Defaults to "y".
             y_offset (int, optional): The y offset of the labels. Defaults to -8.
             text_font_size (str, optional): The font size of the labels. Defaults to "11px".
             text_color (str, optional): The text color of the labels. Defaults to "#555555".
             text_align (str, optional): The text alignment of the labels. Defaults to 'center'.
         """
-        for i in range(len(period_list)):
-            period_group = period_list[i]
-            source = self.get_source_from_event_dict(period_group)
-            labels = LabelSet(
-                x='mid',
-                y=value("p" + str(i)),
-                text=text,
-                y_offset=y_offset,
-                text_font_size=text_font_size,
-                text_color=text_color,
-                text_align=text_align,
-                source=source,
-            )
-            plot.add_layout(labels)
+        from bokeh.models import LabelSet
+
+        if len(source.data['mid']) == 0:
+            return
+        labels = LabelSet(
+            x='mid',
+            y=y,
+            text=text,
+            y_offset=y_offset,
+            text_font_size=text_font_size,
+            text_color=text_color,
+            text_align=text_align,
+            source=source,
+        )
+        plot.add_layout(labels)
 
 
     def format_xaxis(self, plot: figure, scientific: bool = False) -> figure:
@@ -188,12 +313,9 @@ class HistoricalTimelineRenderer:
         Returns:
             figure: The modified plot
         """
-        code = ""
-        if scientific:
-            code = '''return tick < 0 ? Math.abs(tick) + " BCE" : tick +  " CE"'''
-        else:
-            code = '''return tick < 0 ? Math.abs(tick) + " BC" : tick +  " AD"'''
-        plot.xaxis.formatter = CustomJSTickFormatter(code=code)
+        from bokeh.models import CustomJSTickFormatter
+
+        plot.xaxis.formatter = CustomJSTickFormatter(code=self._xaxis_formatter_code[scientific])
         return plot
 
 
@@ -206,26 +328,87 @@ class HistoricalTimelineRenderer:
             output (str): The filename to save the timeline as
             show_timeline (bool): Whether to display the timeline rather than saving it
         """
+        from bokeh.plotting import save, show
+
         p = self.render_timeline()
         if show_timeline:
             show(p, title=self.tl.title)
         else:
             save(p, output, title=self.tl.title)
 
+    def get_render_key(self) -> tuple:
+        """Get a key identifying everything the rendered figure depends on
+
+        The timeline itself is part of the key and is compared by identity, so swapping in another
+        timeline is noticed even if it has the same title and version. Its version comes last so
+        that everything else can be compared on its own.
+
+        Returns:
+            tuple: The timeline, its title, the renderer colors and the timeline version
+        """
+        return (
+            self.tl,
+            self.tl.title,
+            self.bg_color,
+            self.bg_alpha,
+            self.period_color,
+            self.event_color,
+            self.tl.version,
+        )
+
+    def get_render_data(self) -> tuple[dict, dict, list[str]]:
+        """Gather everything from the timeline that a figure is built from
+
+        The period list is only walked once here, and the combined period data is shared by the
+        period bars, their labels and any later update of the figure.
+
+        Returns:
+            tuple[dict, dict, list[str]]: The event dict, the combined period dict and the y range
+        """
+        event_dict = self.tl.create_event_dict()
+        period_list = self.tl.create_period_list()
+        period_names = self.get_period_names(period_list)
+        period_dict = self.get_period_dict(period_list, period_names)
+        y_range = self.get_y_range(event_dict, period_list, period_names)
+        return event_dict, period_dict, y_range
+
     def render_timeline(self) -> figure:
         """Render a timeline as a figure
 
+        The figure is cached and returned again as long as neither the timeline nor the renderer
+        settings have changed since the last render. Changes to the timeline are only noticed when
+        they go through add_event, add_events or sort; editing its events or periods lists directly
+        leaves the cached figure in place.
+
         Args:
             timeline (str): The HistoricalTimeline object to render
 
         Returns:
             figure: The resulting plot
         """
-        event_dict = self.tl.create_event_dict()
-        period_list = self.tl.create_period_list()
+        key = self.get_render_key()
+        if self._figure is not None and self._figure_key == key:
+            return self._figure
+        return self.build_figure(key, *self.get_render_data())
+
+    def build_figure(self, key: tuple, event_dict: dict, period_dict: dict, y_range: list[str]) -> figure:
+        """Build a new figure from data gathered by get_render_data and cache it
+
+        Args:
+            key (tuple): The render key the data was gathered for
+            event_dict (dict): The event dictionary
+            period_dict (dict): The combined period dictionary
+            y_range (list[str]): The labels that populate the y range
 
-        source = self.get_source_from_event_dict(event_dict)
-        y_range = self.get_y_range(event_dict, period_list)
+        Returns:
+            figure: The resulting plot
+        """
+        self._source_cache.clear()
+
+        # Each source is created once and shared by every glyph, label and tooltip drawing from it,
+        # so that update_timeline only has one source of each kind to update
+        self._event_source = source = self.get_source_from_event_dict(event_dict)
+        self._period_source = period_source = self.get_source_from_event_dict(period_dict)
         p = self.setup_figure(
             title=self.tl.title, 
             x_axis_label="year",
@@ -236,13 +419,99 @@ class HistoricalTimelineRenderer:
             border_fill_color = self.bg_color,
             background_fill_alpha = self.bg_alpha,
             border_fill_alpha = self.bg_alpha,
-            tools=self.tools
+            tools=self.get_tools()
         )
         self.event_tooltips(p, tooltip_names=["title", "description"])
-        self.render_events(p, source, x='dates', y='label', size=20)
-        self.render_periods(p, period_list)
-        self.period_labels(p, period_list, text="title")
-        self.event_labels(p, source, x="dates", y="label", text="title")
+        if len(event_dict['label']) > 0:
+            self.render_events(p, source, x='dates', y='label', size=20)
+        if len(period_dict['start']) > 0:
+            self.render_periods(p, period_source)
+            self.period_labels(p, period_source, text="title")
+        if len(event_dict['label']) > 0:
+            self.event_labels(p, source, x="dates", y="label", text="title")
         self.format_xaxis(p, False)
-        
-        return p
\ No newline at end of file
+
+        self._figure = p
+        self._figure_key = key
+        self._event_dict = event_dict
+        self._period_dict = period_dict
+        self._y_range = y_range
+        return p
+
+    def column_starts_with(self, column, prefix) -> bool:
+        """Check whether a data column begins with all the values of another column
+
+        Args:
+            column (list | np.ndarray): The column to check
+            prefix (list | np.ndarray): The values column should begin with
+
+        Returns:
+            bool: True if the first values of column are the values of prefix
+        """
+        if isinstance(column, np.ndarray) or isinstance(prefix, np.ndarray):
+            return np.array_equal(column[: len(prefix)], prefix)
+        return column[: len(prefix)] == prefix
+
+    def update_source(self, source: ColumnDataSource, old_dict: dict, new_dict: dict) -> None:
+        """Bring a ColumnDataSource from the data in old_dict up to the data in new_dict
+
+        If new_dict only appends rows to old_dict, only the new rows are streamed to the source.
+        Otherwise the whole data of the source is replaced.
+
+        Args:
+            source (ColumnDataSource): The source holding the data of old_dict
+            old_dict (dict): The data the source was created from
+            new_dict (dict): The data the source should hold
+        """
+        n = len(next(iter(old_dict.values()), []))
+        if old_dict.keys() == new_dict.keys() and all(
+            self.column_starts_with(new_dict[k], old_dict[k]) for k in old_dict
+        ):
+            new_rows = {k: v[n:] for k, v in new_dict.items()}
+            if len(next(iter(new_rows.values()), [])) > 0:
+                source.stream(new_rows)
+        else:
+            source.data = self.get_source_data(new_dict)
+
+    def update_timeline(self, events: list[HistoricalEvent] = None) -> figure:
+        """Update the rendered figure in place with changes to the timeline
+
+        Instead of rebuilding the figure, the new events and periods are streamed into the existing
+        data sources. The figure is only rebuilt when the y range categories or the renderer settings
+        change, or when nothing has been rendered yet.
+
+        Args:
+            events (list[HistoricalEvent], optional): Events to add to the timeline before updating. Defaults to None.
+
+        Returns:
+            figure: The updated plot
+        """
+        if events:
+            self.tl.add_events(events)
+
+        key = self.get_render_key()
+        if self._figure is None or self._figure_key[:-1] != key[:-1]:
+            return self.render_timeline()
+        if self._figure_key == key:
+            return self._figure
+
+        event_dict, period_dict, y_range = self.get_render_data()
+        if y_range != self._y_range:
+            return self.build_figure(key, event_dict, period_dict, y_range)
+
+        # Send both updates to the browser together, unless the caller already holds the document
+        doc = self._figure.document
+        hold = doc is not None and doc.callbacks.hold_value is None
+        if hold:
+            doc.hold("combine")
+        try:
+            self.update_source(self._event_source, self._event_dict, event_dict)
+            self.update_source(self._period_source, self._period_dict, period_dict)
+        finally:
+            if hold:
+                doc.unhold()
+
+        self._figure_key = key
+        self._event_dict = event_dict
+        self._period_dict = period_dict
+        return self._figure
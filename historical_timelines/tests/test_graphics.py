@@ -8,3 +8,12 @@ def test_get_y_range():
     y = get_y_range(fake_labels, fake_periods)
 
     assert y == ['p0', 'p1', 'a', 'b', 'c', 'd']
+
+
+def test_render_timeline(tmp_path):
+    t0 = HistoricalTimeline()
+    t0.populate_random_timeline(10)
+
+    render_timeline(str(tmp_path / "timeline.html"), t0.title, t0.create_event_dict(), t0.create_period_list())
+
+    assert (tmp_path / "timeline.html").exists()
@@ -0,0 +1,193 @@
+from historical_timelines import *
+import numpy as np
+from bokeh.document import Document
+from bokeh.models import HBar, LabelSet, Scatter
+from historical_timelines.tests.test_integration import csv_timeline
+
+
+def event_source(p):
+    return next(renderer.data_source for renderer in p.renderers if isinstance(renderer.glyph, Scatter))
+
+
+def test_period_dict():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    period_dict = r.get_period_dict(r.tl.create_period_list())
+
+    assert len(period_dict["start"]) == 17
+    assert list(dict.fromkeys(period_dict["y"])) == ['p0', 'p1', 'p2']
+
+
+def test_render_periods_single_glyph():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    p = r.render_timeline()
+    hbars = [renderer for renderer in p.renderers if isinstance(renderer.glyph, HBar)]
+    label_sets = [layout for layout in p.center if isinstance(layout, LabelSet)]
+
+    assert len(hbars) == 1
+    assert len(label_sets) == 2
+
+
+def test_render_timeline_cached():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    p = r.render_timeline()
+
+    assert r.render_timeline() is p
+
+    r.tl.add_event(HistoricalEvent.get_random_event())
+    assert r.render_timeline() is not p
+
+
+def test_render_timeline_swapped_timeline():
+    t0 = HistoricalTimeline()
+    t0.populate_random_timeline(10)
+    t1 = HistoricalTimeline()
+    t1.populate_random_timeline(10)
+    r = HistoricalTimelineRenderer(t0)
+    p = r.render_timeline()
+
+    r.tl = t1
+    assert t0.version == t1.version and t0.title == t1.title
+    assert r.render_timeline() is not p
+
+
+def test_period_labels_single_labelset():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    p = r.render_timeline()
+    hbar = next(renderer for renderer in p.renderers if isinstance(renderer.glyph, HBar))
+    period_label_sets = [
+        layout for layout in p.center if isinstance(layout, LabelSet) and layout.source is hbar.data_source
+    ]
+
+    assert len(period_label_sets) == 1
+    assert period_label_sets[0].y == 'y'
+
+
+def test_setup_figure_backend():
+    r = HistoricalTimelineRenderer(HistoricalTimeline())
+
+    assert r.setup_figure().output_backend == "webgl"
+    assert r.setup_figure(output_backend="canvas").output_backend == "canvas"
+
+
+def test_setup_figure_lod():
+    r = HistoricalTimelineRenderer(HistoricalTimeline())
+
+    assert r.setup_figure().lod_threshold == 2000
+    assert r.setup_figure(lod_threshold=None).lod_threshold is None
+
+
+def test_event_source_reused():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    event_dict = r.tl.create_event_dict()
+
+    assert r.get_source_from_event_dict(event_dict) is r.get_source_from_event_dict(event_dict)
+    assert r.get_source_from_event_dict(event_dict) is not r.get_source_from_event_dict(r.tl.create_event_dict())
+
+
+def test_get_y_range_array_labels():
+    r = HistoricalTimelineRenderer(HistoricalTimeline())
+    fake_labels = {'label': np.array(['a', 'a', 'c', 'a', 'b', 'd', 'c'])}
+
+    y = r.get_y_range(fake_labels, [[], []])
+
+    assert y == ['p0', 'p1', 'a', 'c', 'b', 'd']
+
+
+def test_update_timeline_streams_events():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    p = r.render_timeline()
+    event = HistoricalEvent.event_from_dict(
+        {"title": "Late", "description": "A late event", "label": "Event", "start": 1000, "end": None, "era": Era.BCE}
+    )
+
+    assert r.update_timeline([event]) is p
+    assert len(event_source(p).data["dates"]) == 17
+    assert event_source(p).data["title"][-1] == "Late"
+
+
+def test_update_timeline_rebuilds_on_new_label(tmp_path):
+    r = HistoricalTimelineRenderer(csv_timeline())
+    p = r.render_timeline()
+    r.output_timeline(str(tmp_path / "before.html"))
+    event = HistoricalEvent.event_from_dict(
+        {"title": "Late", "description": "A late event", "label": "New", "start": 1000, "end": None, "era": Era.BCE}
+    )
+
+    p2 = r.update_timeline([event])
+
+    assert p2 is not p
+    assert "New" in p2.y_range.factors
+
+    r.output_timeline(str(tmp_path / "after.html"))
+    assert (tmp_path / "after.html").exists()
+
+
+def test_render_empty_periods():
+    t0 = HistoricalTimeline()
+    t0.add_event(
+        HistoricalEvent.event_from_dict(
+            {"title": "Alone", "description": "No periods", "label": "Event", "start": 1000, "end": None, "era": Era.BCE}
+        )
+    )
+    p = HistoricalTimelineRenderer(t0).render_timeline()
+
+    assert not [renderer for renderer in p.renderers if isinstance(renderer.glyph, HBar)]
+    assert len([layout for layout in p.center if isinstance(layout, LabelSet)]) == 1
+
+
+def test_source_numeric_columns():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    source = r.get_source_from_event_dict(r.tl.create_event_dict())
+
+    assert isinstance(source.data["dates"], np.ndarray)
+    assert isinstance(source.data["title"], list)
+
+
+def test_source_data_leaves_other_columns():
+    r = HistoricalTimelineRenderer(HistoricalTimeline())
+    event_dict = {'title': ['a', 'b'], 'xs': [[1, 2], [3]], 'mixed': [1, 'a']}
+
+    data = r.get_source_data(event_dict)
+
+    assert data['title'] is event_dict['title']
+    assert data['xs'] is event_dict['xs']
+    assert data['mixed'] is event_dict['mixed']
+    assert r.get_source_from_event_dict(event_dict).data['xs'] == [[1, 2], [3]]
+
+
+def test_single_event_source():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    p = r.render_timeline()
+    hbar = next(renderer for renderer in p.renderers if isinstance(renderer.glyph, HBar))
+    sources = {renderer.data_source for renderer in p.renderers}
+    sources.update(layout.source for layout in p.center if isinstance(layout, LabelSet))
+
+    assert sources == {event_source(p), hbar.data_source}
+
+
+def test_update_timeline_keeps_caller_hold():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    p = r.render_timeline()
+    doc = Document()
+    doc.add_root(p)
+    event = HistoricalEvent.event_from_dict(
+        {"title": "Late", "description": "A late event", "label": "Event", "start": 1000, "end": None, "era": Era.BCE}
+    )
+
+    doc.hold("combine")
+    r.update_timeline([event])
+    assert doc.callbacks.hold_value == "combine"
+
+    doc.unhold()
+    r.update_timeline([event])
+    assert doc.callbacks.hold_value is None
+
+
+def test_build_figure_array_labels():
+    r = HistoricalTimelineRenderer(csv_timeline())
+    event_dict, period_dict, y_range = r.get_render_data()
+    event_dict['label'] = np.array(event_dict['label'])
+
+    p = r.build_figure(r.get_render_key(), event_dict, period_dict, y_range)
+
+    assert event_source(p) is not None
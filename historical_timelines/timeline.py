@@ -8,12 +8,14 @@ class HistoricalTimeline:
     title: str
     events: list[HistoricalEvent]
     periods: list[HistoricalEvent]
+    version: int
 
     def __init__(self, title: str = "") -> None:
         """Initialization function"""
         self.title = title
         self.events = []
         self.periods = []
+        self.version = 0
 
     def __str__(self) -> str:
         """To string function
@@ -54,6 +56,7 @@ class HistoricalTimeline:
             self.events.append(event)
         elif event.is_period():
             self.periods.append(event)
+        self.version += 1
 
     def add_events(self, events: list[HistoricalEvent]) -> None:
         """Add a list of events
@@ -68,6 +71,7 @@ class HistoricalTimeline:
         """Sorts the timeline"""
         self.events.sort()
         self.periods.sort()
+        self.version += 1
 
     def collision_sort(self) -> list[list[HistoricalEvent]]:
         """Generates lists of subsets of periods such that no periods overlap
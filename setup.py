@@ -14,6 +14,7 @@ setup(
     author_email='darthbeep@gmail.com',
     packages=['historical_timelines'],
     install_requires=[
-        'bokeh',
+        'bokeh>=3.3.0',
+        'numpy',
     ],
 )